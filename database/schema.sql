@@ -41,3 +41,20 @@ CREATE TABLE IF NOT EXISTS throws (
   is_bust BOOLEAN DEFAULT FALSE, -- True if this throw caused a bust
   created_at TIMESTAMP DEFAULT NOW()
 );
+
+-- TABLE: visits
+-- Per-visit (round) aggregates, kept in sync with throws on record/undo.
+CREATE TABLE IF NOT EXISTS visits (
+  game_id UUID REFERENCES games(id),
+  player_id UUID REFERENCES players(id),
+  round_number INT NOT NULL,         -- Matches throws.round_number
+  darts_used INT NOT NULL,           -- Darts counted, up to the bust/checkout dart
+  points INT NOT NULL,               -- Points counted towards the score (0 on bust)
+  is_bust BOOLEAN DEFAULT FALSE,     -- True if the visit ended in a bust
+  remaining_score INT NOT NULL,      -- Score left after the visit
+  is_checkout BOOLEAN DEFAULT FALSE, -- True if the visit finished the game
+  PRIMARY KEY (game_id, round_number)
+);
+
+-- Throws are always read per game
+CREATE INDEX IF NOT EXISTS idx_throws_game_id ON throws (game_id);
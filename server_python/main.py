@@ -1,7 +1,8 @@
 from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from database import get_db_connection, init_db
+from database import get_db_connection, init_db, rebuild_visits, sync_visit
 from models import GameCreate, ThrowInput, UserRegister, UserLogin, ForgotPasswordRequest, ResetPasswordRequest
+from scoring_utils import apply_dart
 import uuid
 from passlib.context import CryptContext
 from jose import jwt, JWTError
@@ -307,23 +308,10 @@ def calculate_game_state(start_score, players, throws):
             # This is complex. For now, assume strict order in DB.
             pass
 
-        points = t['score_value'] * t['multiplier']
-        current_score = scores[pid]
-        
-        new_score = current_score - points
-        is_bust = False
-        
-        # 1. Check Win (Double Out)
-        if new_score == 0:
-            if t['multiplier'] == 2:
-                scores[pid] = 0
-                winner_id = pid
-            else:
-                is_bust = True # Hit 0 but not with double
-        
-        # 2. Check Bust
-        elif new_score < 0 or new_score == 1:
-             is_bust = True
+        new_score, is_bust, is_checkout = apply_dart(scores[pid], t['score_value'], t['multiplier'])
+
+        if is_checkout:
+            winner_id = pid
              
         # Apply Logic
         if is_bust:
@@ -351,6 +339,17 @@ def calculate_game_state(start_score, players, throws):
     return scores, current_player_id, winner_id, processed_throws
 
 
+def get_last_visit(cur, game_id):
+    cur.execute("""
+        SELECT player_id, round_number, darts_used, is_bust, is_checkout
+        FROM visits
+        WHERE game_id = %s
+        ORDER BY round_number DESC
+        LIMIT 1
+    """, (game_id,))
+    return cur.fetchone()
+
+
 @app.get("/api/games/{game_id}")
 def get_game_state(game_id: uuid.UUID):
     with get_db_connection() as conn:
@@ -399,10 +398,33 @@ def get_game_state(game_id: uuid.UUID):
             }
 
 
+@app.get("/api/games/{game_id}/visits")
+def get_game_visits(game_id: uuid.UUID):
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM games WHERE id = %s", (game_id,))
+            if not cur.fetchone():
+                raise HTTPException(status_code=404, detail="Game not found")
+
+            # One row per visit instead of one per dart
+            cur.execute("""
+                SELECT player_id, round_number, darts_used, points, is_bust, remaining_score, is_checkout
+                FROM visits
+                WHERE game_id = %s
+                ORDER BY round_number
+            """, (game_id,))
+            return cur.fetchall()
+
+
 @app.post("/api/games/{game_id}/throw")
 def record_throw(game_id: uuid.UUID, throw_data: ThrowInput):
     with get_db_connection() as conn:
         with conn.cursor() as cur:
+            # Lock the game row so concurrent throws/undos for the same game run one at a time
+            cur.execute("SELECT id FROM games WHERE id = %s FOR UPDATE", (game_id,))
+            if not cur.fetchone():
+                raise HTTPException(status_code=404, detail="Game not found")
+
             # Get players to find order
             cur.execute("""
                 SELECT p.id
@@ -415,12 +437,32 @@ def record_throw(game_id: uuid.UUID, throw_data: ThrowInput):
             if not players:
                  raise HTTPException(status_code=404, detail="Game not found")
 
-            # Count throws to find whose turn it is
-            cur.execute("SELECT count(*) as c FROM throws WHERE game_id = %s", (game_id,))
-            count = cur.fetchone()['c']
-            
-            player_idx = (count // 3) % len(players)
-            player_id = players[player_idx]['id']
+            # The last visit decides whose turn it is, same as calculate_game_state:
+            # a turn ends after 3 darts, a bust or a checkout
+            last_visit = get_last_visit(cur, game_id)
+            if not last_visit:
+                # Throws without visits (e.g. backfill failed): rebuild before deciding
+                cur.execute("SELECT 1 FROM throws WHERE game_id = %s LIMIT 1", (game_id,))
+                if cur.fetchone():
+                    rebuild_visits(cur, game_id)
+                    last_visit = get_last_visit(cur, game_id)
+
+            if not last_visit:
+                round_number = 1
+                throw_number = 1
+                player_id = players[0]['id']
+            elif last_visit['is_checkout']:
+                raise HTTPException(status_code=400, detail="Game is already finished")
+            elif last_visit['is_bust'] or last_visit['darts_used'] >= 3:
+                player_ids = [p['id'] for p in players]
+                last_idx = player_ids.index(last_visit['player_id']) if last_visit['player_id'] in player_ids else -1
+                round_number = last_visit['round_number'] + 1
+                throw_number = 1
+                player_id = player_ids[(last_idx + 1) % len(player_ids)]
+            else:
+                round_number = last_visit['round_number']
+                throw_number = last_visit['darts_used'] + 1
+                player_id = last_visit['player_id']
             
             total_points = throw_data.score_value * throw_data.multiplier
             
@@ -432,11 +474,14 @@ def record_throw(game_id: uuid.UUID, throw_data: ThrowInput):
             """, (
                 game_id, 
                 player_id, 
-                (count // 3) + 1, # Round
-                (count % 3) + 1,  # Throw # within turn (1-3) is simpler to just derive, but schema asks for it.
+                round_number,
+                throw_number,
                 throw_data.score_value, 
                 throw_data.multiplier
             ))
+
+            # Keep the visit aggregate in the same transaction
+            sync_visit(cur, game_id, round_number)
             conn.commit()
             
             return {"status": "recorded"}
@@ -445,13 +490,27 @@ def record_throw(game_id: uuid.UUID, throw_data: ThrowInput):
 def undo_last_throw(game_id: uuid.UUID):
     with get_db_connection() as conn:
         with conn.cursor() as cur:
+            # Lock the game row so concurrent throws/undos for the same game run one at a time
+            cur.execute("SELECT id FROM games WHERE id = %s FOR UPDATE", (game_id,))
+            if not cur.fetchone():
+                raise HTTPException(status_code=404, detail="Game not found")
+
             # Check if there are throws to undo
-            cur.execute("SELECT id FROM throws WHERE game_id = %s ORDER BY created_at DESC LIMIT 1", (game_id,))
+            cur.execute("""
+                SELECT id, round_number
+                FROM throws
+                WHERE game_id = %s
+                ORDER BY round_number DESC, throw_number DESC
+                LIMIT 1
+            """, (game_id,))
             row = cur.fetchone()
             if not row:
                 raise HTTPException(status_code=400, detail="No throws to undo")
             
             # Delete the last throw
             cur.execute("DELETE FROM throws WHERE id = %s", (row['id'],))
+
+            # Shrink (or drop) its visit in the same transaction
+            sync_visit(cur, game_id, row['round_number'])
             conn.commit()
             return {"status": "undone"}
@@ -0,0 +1,68 @@
+from itertools import groupby
+
+
+def apply_dart(current_score, score_value, multiplier):
+    # Single source of truth for the per-dart 501 rules.
+    # Returns (new_score, is_bust, is_checkout). On a bust new_score is left as thrown;
+    # callers revert to the score at the start of the visit.
+    new_score = current_score - score_value * multiplier
+
+    # 1. Check Win (Double Out)
+    if new_score == 0:
+        if multiplier == 2:
+            return 0, False, True
+        return new_score, True, False # Hit 0 but not with double
+
+    # 2. Check Bust
+    if new_score < 0 or new_score == 1:
+        return new_score, True, False
+
+    return new_score, False, False
+
+
+def calculate_visit(score_at_start, darts):
+    # Aggregate the darts of a single visit
+    score = score_at_start
+    darts_used = 0
+    is_bust = False
+    is_checkout = False
+
+    for d in darts:
+        # Darts after a bust or checkout don't count towards the visit
+        if is_bust or is_checkout:
+            break
+
+        darts_used += 1
+        new_score, is_bust, is_checkout = apply_dart(score, d['score_value'], d['multiplier'])
+        if not is_bust:
+            score = new_score
+
+    remaining_score = score_at_start if is_bust else score
+
+    return {
+        "darts_used": darts_used,
+        "points": score_at_start - remaining_score,
+        "is_bust": is_bust,
+        "remaining_score": remaining_score,
+        "is_checkout": is_checkout
+    }
+
+
+def calculate_visits(start_score, throws):
+    # Aggregate a whole game's throws (ordered by round, then dart) into visits.
+    # Returns a list of (round_number, player_id, visit).
+    scores = {}
+    visits = []
+
+    for round_number, darts in groupby(throws, key=lambda t: t['round_number']):
+        darts = list(darts)
+        player_id = darts[0]['player_id']
+        visit = calculate_visit(scores.get(str(player_id), start_score), darts)
+        scores[str(player_id)] = visit['remaining_score']
+        visits.append((round_number, player_id, visit))
+
+        # Throws after the winning visit are ignored, same as the replay
+        if visit['is_checkout']:
+            break
+
+    return visits
@@ -1,6 +1,11 @@
 import requests
 import json
 import time
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server_python"))
+from scoring_utils import calculate_visit, calculate_visits
 
 BASE_URL = "http://localhost:3000/api"
 
@@ -24,6 +29,86 @@ def get_state(game_id):
     response = requests.get(f"{BASE_URL}/games/{game_id}")
     return response.json()
 
+def get_visits(game_id):
+    response = requests.get(f"{BASE_URL}/games/{game_id}/visits")
+    return response.json()
+
+def undo(game_id):
+    response = requests.delete(f"{BASE_URL}/games/{game_id}/undo")
+    return response.json()
+
+def check(label, actual, expected):
+    print(f"{label} (Expected {expected}): {actual}")
+    if actual == expected: print("PASS")
+    else: print("FAIL")
+
+def dart(multiplier, value):
+    return {"score_value": value, "multiplier": multiplier}
+
+def test_calculate_visit():
+    print("--- Visit Aggregate Tests (offline) ---")
+
+    # Normal visit: T20 T20 T20 from 501
+    visit = calculate_visit(501, [dart(3, 20), dart(3, 20), dart(3, 20)])
+    check("[Visit 1] 180 remaining", visit["remaining_score"], 321)
+    check("[Visit 1] 180 points", visit["points"], 180)
+    check("[Visit 1] 180 darts", visit["darts_used"], 3)
+
+    # Bust reverts the score: 40 left, T20 busts on dart 1, later darts ignored
+    visit = calculate_visit(40, [dart(3, 20), dart(1, 1), dart(1, 1)])
+    check("[Visit 2] Bust flag", visit["is_bust"], True)
+    check("[Visit 2] Bust remaining", visit["remaining_score"], 40)
+    check("[Visit 2] Bust points", visit["points"], 0)
+    check("[Visit 2] Bust darts", visit["darts_used"], 1)
+
+    # Leaving 1 is a bust too
+    visit = calculate_visit(41, [dart(2, 20)])
+    check("[Visit 3] One left is bust", visit["is_bust"], True)
+
+    # Double-out checkout on dart 2, stray third dart ignored
+    visit = calculate_visit(40, [dart(1, 20), dart(2, 10), dart(1, 5)])
+    check("[Visit 4] Checkout flag", visit["is_checkout"], True)
+    check("[Visit 4] Checkout remaining", visit["remaining_score"], 0)
+    check("[Visit 4] Checkout darts", visit["darts_used"], 2)
+
+    # Hitting 0 without a double is a bust
+    visit = calculate_visit(20, [dart(1, 20)])
+    check("[Visit 5] Zero without double", visit["is_bust"], True)
+
+    # Open visit with fewer than 3 darts
+    visit = calculate_visit(501, [dart(1, 20)])
+    check("[Visit 6] Open visit darts", visit["darts_used"], 1)
+    check("[Visit 6] Open visit remaining", visit["remaining_score"], 481)
+
+def test_calculate_visits():
+    print("--- Game Visit Rebuild Tests (offline) ---")
+
+    def round_darts(player_id, round_number, darts):
+        return [{"player_id": player_id, "round_number": round_number, **d} for d in darts]
+
+    # Each player's visit starts from their own previous remaining score
+    throws = (
+        round_darts("A", 1, [dart(3, 20), dart(3, 20), dart(3, 20)])
+        + round_darts("B", 2, [dart(1, 1), dart(1, 1), dart(1, 1)])
+        + round_darts("A", 3, [dart(3, 20)])
+    )
+    visits = calculate_visits(501, throws)
+    check("[Rebuild 1] Visit count", len(visits), 3)
+    check("[Rebuild 1] B remaining", visits[1][2]["remaining_score"], 498)
+    check("[Rebuild 1] A carries over", visits[2][2]["remaining_score"], 261)
+
+    # Rounds after a checkout are dropped, like the replay ignores throws after a winner
+    throws = (
+        round_darts("A", 1, [dart(1, 20), dart(3, 20)])
+        + round_darts("B", 2, [dart(2, 20)])
+        + round_darts("A", 3, [dart(1, 20)])
+    )
+    visits = calculate_visits(40, throws)
+    check("[Rebuild 2] Visit count", len(visits), 2)
+    check("[Rebuild 2] A bust darts", visits[0][2]["darts_used"], 2)
+    check("[Rebuild 2] A bust remaining", visits[0][2]["remaining_score"], 40)
+    check("[Rebuild 2] B checkout", visits[1][2]["is_checkout"], True)
+
 def run_tests():
     print("--- Starting 501 Logic Tests ---")
     
@@ -44,6 +129,15 @@ def run_tests():
     if p1_score == 441: print("PASS")
     else: print("FAIL")
 
+    visits = get_visits(game_id)
+    check("Visit rows after 1 dart", len(visits), 1)
+    check("Visit darts_used", visits[0]["darts_used"], 1)
+    check("Visit remaining_score", visits[0]["remaining_score"], 441)
+
+    # Undo the only dart of the visit -> visit row is removed
+    undo(game_id)
+    check("Visit rows after undo", len(get_visits(game_id)), 0)
+
     # Test 2: Bust Logic
     # We need to simulate a bust.
     # Player 1 is at 441. 
@@ -88,8 +182,53 @@ def run_tests():
     else:
         print("FAIL (Logic did not revert score on Bust)")
 
+    visits = get_visits(gid_bust)
+    check("Visit rows after 3 visits", len(visits), 3)
+    check("Third visit bust", visits[2]["is_bust"], True)
+    check("Third visit remaining_score", visits[2]["remaining_score"], 151)
+    check("Third visit points", visits[2]["points"], 0)
+
+    # Undo the busting dart -> visit shrinks to 2 darts and is no longer a bust
+    undo(gid_bust)
+    visits = get_visits(gid_bust)
+    check("Visit rows after undo", len(visits), 3)
+    check("Third visit darts_used after undo", visits[2]["darts_used"], 2)
+    check("Third visit bust after undo", visits[2]["is_bust"], False)
+    check("Third visit remaining_score after undo", visits[2]["remaining_score"], 51)
+
+    # Test 3: Bust before dart 3 ends the turn, so the next dart belongs to the next player
+    game_early = requests.post(f"{BASE_URL}/games", json={"player_names": ["EarlyBust", "Finisher"], "start_score": 40}).json()
+    gid_early = game_early["game_id"]
+    pid_early, pid_finisher = game_early["player_ids"]
+
+    throw(gid_early, 1, 20) # 20 left
+    throw(gid_early, 3, 20) # -40 -> BUST on dart 2, back to 40
+    throw(gid_early, 2, 20) # Finisher: D20 checkout
+
+    print("\n[Test 3] Bust on dart 2 followed by more throws")
+    state = get_state(gid_early)
+    visits = get_visits(gid_early)
+    check("Winner", state["winner_id"], pid_finisher)
+    check("Visit rows", len(visits), 2)
+    check("Bust visit player", visits[0]["player_id"], pid_early)
+    check("Bust visit darts_used", visits[0]["darts_used"], 2)
+    check("Bust visit remaining_score", visits[0]["remaining_score"], state["scores"][pid_early])
+    check("Checkout visit player", visits[1]["player_id"], pid_finisher)
+    check("Checkout visit flag", visits[1]["is_checkout"], True)
+    check("Checkout visit remaining_score", visits[1]["remaining_score"], state["scores"][pid_finisher])
+
+    # Test 4: Throws after a checkout are refused and add no visits
+    print("\n[Test 4] Throw after checkout")
+    response = requests.post(f"{BASE_URL}/games/{gid_early}/throw", json={"multiplier": 1, "score_value": 20})
+    check("Status code", response.status_code, 400)
+    check("Visit rows", len(get_visits(gid_early)), 2)
+    check("Winner unchanged", get_state(gid_early)["winner_id"], pid_finisher)
+
     
 if __name__ == "__main__":
+    test_calculate_visit()
+    test_calculate_visits()
+
     try:
         run_tests()
     except Exception as e: